@@ -1,20 +1,29 @@
 import streamlit as st
-from biglittlematcher import BigLittleMatcher
-import graphviz
-from collections import defaultdict
 import json
-import base64
+from operator import itemgetter
+import orjson
+import pandas as pd
+from types import MappingProxyType
 from galeshapely import GaleShapley
 
 st.set_page_config(page_title="Big-Little Matcher", layout="wide")
 
-st.title("Big-Little Matcher")
-st.markdown("""
+# Static markdown shown on the page
+INTRO_MD = """
 This app helps you solve different variants of the Big-Little matching problem. Choose the type of matching problem and provide your data to find optimal matches.
-""")
+"""
+
+CUSTOM_DATA_MD = """
+**Enter your data in JSON format:**
+- For bigs/littles, you can include a "max" field to specify maximum matches.
+- For preferences, use ranked lists or dictionaries based on the problem type.
+"""
+
+st.title("Big-Little Matcher")
+st.markdown(INTRO_MD)
 
-# Dictionary containing descriptions for each problem type
-problem_descriptions = {
+# Read-only mapping containing descriptions for each problem type
+problem_descriptions = MappingProxyType({
     "Gale-Shapley Algorithm": """
     The original algorithm for solving the stable matching problem. It guarantees a stable matching
     in O(n²) time, where n is the number of participants. This algorithm favors the proposing side.
@@ -44,37 +53,66 @@ problem_descriptions = {
     Instead of focusing solely on stability, this approach maximizes overall satisfaction based on preference rankings. 
     It allows for specifying how much weight to give to big preferences versus little preferences.
     """
-}
+})
+
+PROBLEM_TYPES = list(problem_descriptions.keys())
 
 # Sidebar for selecting the matching problem type
 st.sidebar.header("Choose Matching Problem")
 problem_type = st.sidebar.selectbox(
     "Select the type of matching problem:",
-    list(problem_descriptions.keys())
+    PROBLEM_TYPES
 )
 
-# Initialize session state for storing matches and littles as proposers
-if 'gs_matches' not in st.session_state:
-    st.session_state.gs_matches = None
-if 'show_littles_as_proposers' not in st.session_state:
-    st.session_state.show_littles_as_proposers = False
-if 'littles_proposer_clicked' not in st.session_state:
-    st.session_state.littles_proposer_clicked = False
-if 'big_prefs' not in st.session_state:
-    st.session_state.big_prefs = None
-if 'little_prefs' not in st.session_state:
-    st.session_state.little_prefs = None
+# Initialize session state for storing matches, littles as proposers, and the latest results
+SESSION_DEFAULTS = {
+    'gs_matches': None,
+    'gs_matches_alt': None,
+    'show_littles_as_proposers': False,
+    'littles_proposer_clicked': False,
+    'big_prefs': None,
+    'little_prefs': None,
+    'gs_inputs': None,
+    'last_result': None
+}
+for key, value in SESSION_DEFAULTS.items():
+    st.session_state.setdefault(key, value)
 
 # Display the description for the selected problem type
 st.sidebar.markdown("### About this matching problem")
 st.sidebar.markdown(problem_descriptions[problem_type])
 
-# Function to display graphviz objects
-def render_graphviz(graph):
-    dot_source = graph.source
-    st.graphviz_chart(dot_source)
+# Colors used to tell participants apart in the matching visualization
+COLORS = ('aqua', 'coral', 'darkgreen', 'gold', 'darkolivegreen1',
+          'deeppink', 'crimson', 'darkorchid', 'bisque', 'yellow')
+_NCOLORS = len(COLORS)
+
+# Function to assign each participant a color that stays the same across reruns
+def get_name_colors(bigs, littles):
+    return color_map(tuple(dict.fromkeys(list(bigs) + list(littles))))
+
+# Function to map names to colors by position, cached on the tuple of names
+@st.cache_data(show_spinner=False)
+def color_map(names):
+    return {name: COLORS[i % _NCOLORS] for i, name in enumerate(names)}
+
+# Function to quote a participant name as a DOT identifier
+def dot_id(name):
+    return '"' + str(name).replace('"', '\\"') + '"'
+
+# Function to build the DOT source for the matching graph, emitting each participant's node only once
+def build_match_graph(matches, name_colors, scores=None):
+    scores = scores or {}
+    # Quote each participant's name once, not once per edge they appear in
+    node_ids = {n: dot_id(n) for n in {n for pair in matches for n in pair}}
+    lines = ["graph {"]
+    lines.extend(f'{node_ids[b]} -- {node_ids[l]} [penwidth={scores.get((b, l), 1)}]' for b, l in matches)
+    lines.extend(f'{node_ids[n]} [color={c}]' for n, c in name_colors.items() if n in node_ids)
+    lines.append("}")
+    return "\n".join(lines)
 
 # Function to create example data based on problem type
+@st.cache_data(show_spinner=False)
 def get_example_data(problem_type):
     if problem_type == "Classic Stable Matching (SMP)":
         bigs = ["Ishaan", "Cindy", "Thomas"]
@@ -158,24 +196,242 @@ def get_example_data(problem_type):
         }
         return bigs, littles, big_prefs, little_prefs
 
+# Function to serialize the example data for every problem type, once per process
+@st.cache_resource(show_spinner=False)
+def get_example_json_table():
+    return {pt: tuple(json.dumps(x, indent=2) for x in get_example_data(pt)) for pt in PROBLEM_TYPES}
+
+# Pre-indented example JSON used to fill the custom data text areas
+EXAMPLE_JSON = get_example_json_table()
+
+# Function to parse one JSON text area, cached so unchanged text is parsed once
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_json(text):
+    return orjson.loads(text)
+
 # Function to convert input data from UI to the appropriate format
 def parse_input_data(problem_type, bigs_text, littles_text, big_prefs_text, little_prefs_text):
     try:
-        bigs = json.loads(bigs_text)
-        littles = json.loads(littles_text)
-        
-        if problem_type in ["Stable Matching with Ties (SMT)", "Stable Matching with Ties and Incomplete Lists (SMTI)"]:
-            big_prefs = json.loads(big_prefs_text)
-            little_prefs = json.loads(little_prefs_text)
-        else:
-            big_prefs = json.loads(big_prefs_text)
-            little_prefs = json.loads(little_prefs_text)
-            
-        return bigs, littles, big_prefs, little_prefs
-    except json.JSONDecodeError as e:
+        return tuple(map(load_json, (bigs_text, littles_text, big_prefs_text, little_prefs_text)))
+    except orjson.JSONDecodeError as e:
         st.error(f"Error parsing JSON input: {str(e)}")
         return None, None, None, None
 
+# Function to load the matcher lazily, so OR-Tools is only imported on the first solve
+@st.cache_resource(show_spinner=False)
+def get_matcher_cls():
+    from biglittlematcher import BigLittleMatcher
+    return BigLittleMatcher
+
+# Model builders for each problem type solved with BigLittleMatcher
+BUILDERS = {
+    "Classic Stable Matching (SMP)": lambda m, kw: m.build_model(),
+    "Stable Matching with Ties (SMT)": lambda m, kw: m.build_model_smt(),
+    "Stable Matching with Ties and Incomplete Lists (SMTI)": lambda m, kw: m.build_model_smti(),
+    "SMTI with Optional Matching": lambda m, kw: m.build_model_smi_two(),
+    "Optimized Matching (with Preference Weights)": lambda m, kw: m.build_model_optimize(**kw)
+}
+
+# Problem types whose model constraints already rule out blocking pairs
+STABLE_BY_CONSTRUCTION = frozenset({
+    "Classic Stable Matching (SMP)",
+    "Stable Matching with Ties (SMT)"
+})
+
+# Function to encode input data as compact JSON bytes, a hashable cache key that is cheap to hash
+def canon(obj, sort_keys=False):
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+
+# Function to fingerprint the inputs a solve would use, so results are only shown while they still match
+def inputs_key(problem_type, input_method, texts, preference_weight, enforce_exactly_one):
+    if input_method == "Use Example Data":
+        data = b""  # the example data is fixed per problem type
+    else:
+        try:
+            data = canon(tuple(map(load_json, texts)))
+        except orjson.JSONDecodeError:
+            data = None
+    return (problem_type, input_method, data, preference_weight, enforce_exactly_one)
+
+# Function to build and solve the matching model, cached on its canonical inputs
+@st.cache_data(show_spinner=False)
+def solve_problem(problem_type, inputs_json, preference_weight=None, enforce_exactly_one=None):
+    bigs, littles, big_prefs, little_prefs = orjson.loads(inputs_json)
+    matcher = get_matcher_cls()(bigs, littles, big_prefs, little_prefs)
+    
+    # Build the appropriate model based on the problem type
+    if problem_type == "Optimized Matching (with Preference Weights)":
+        kwargs = {"preference_weight": preference_weight, "enforce_exactly_one": enforce_exactly_one}
+    else:
+        kwargs = {}
+    BUILDERS[problem_type](matcher, kwargs)
+    
+    matches, objective_value, solve_time = matcher.solve()
+    # Stable models enforce stability in their constraints, so only check the others
+    if problem_type in STABLE_BY_CONSTRUCTION:
+        instabilities = None
+    else:
+        instabilities = matcher.check_instabilities(matches)
+    
+    # Return plain data only so the result can be cached
+    return matches, objective_value, solve_time, matcher.solver.ResponseStats(), instabilities, matcher.scores
+
+# Function to build the matches table, cached on the matches
+@st.cache_data(show_spinner=False)
+def matches_df(matches_tuple):
+    return pd.DataFrame(list(matches_tuple), columns=["Big", "Little"])
+
+# Function to run Gale-Shapley for one proposing side, cached on canonical JSON so key order doesn't matter
+@st.cache_data(show_spinner=False)
+def gs_match(proposer_prefs_json, receiver_prefs_json):
+    return GaleShapley(orjson.loads(proposer_prefs_json), orjson.loads(receiver_prefs_json)).match()
+
+# Function to run Gale-Shapley with bigs or littles as proposers, returning (big, little) pairs
+def solve_gale_shapley(big_prefs, little_prefs, littles_propose=False):
+    big_prefs_json = canon(big_prefs, sort_keys=True)
+    little_prefs_json = canon(little_prefs, sort_keys=True)
+    
+    if littles_propose:
+        # Invert the matches to maintain big->little format
+        return [(big, little) for little, big in gs_match(little_prefs_json, big_prefs_json)]
+    return gs_match(big_prefs_json, little_prefs_json)
+
+# Function to serialize results for download as UTF-8 bytes, cached on the result
+@st.cache_data(show_spinner=False)
+def results_json(matches_tuple, objective_value, problem_type, proposers=None):
+    result = {"matches": [{"big": b, "little": l} for b, l in matches_tuple]}
+    if objective_value is not None:
+        result["objective_value"] = float(objective_value)
+    result["problem_type"] = problem_type
+    if proposers is not None:
+        result["proposers"] = proposers
+    return json.dumps(result, indent=2).encode("utf-8")
+
+# Function to display Gale-Shapley results for both proposing sides
+def show_gale_shapley_results(matches, big_prefs, little_prefs):
+    st.header("Gale-Shapley Results")
+    
+    # Assign colors once for both visualizations
+    name_colors = get_name_colors(big_prefs, little_prefs)
+    
+    # Create tabs for the two different approaches
+    tab1, tab2 = st.tabs(["Bigs as Proposers", "Littles as Proposers"])
+    
+    with tab1:
+        st.markdown("### Bigs as Proposers (optimize bigs' preferences)")
+        
+        # Build the graph for visualization
+        graph = build_match_graph(matches, name_colors)
+        
+        # Display the graph
+        st.subheader("Matching Visualization")
+        st.graphviz_chart(graph)
+        
+        # Display all matches in a table
+        st.subheader("Matches")
+        st.dataframe(matches_df(tuple(matches)))
+    
+    with tab2:
+        st.markdown("### Littles as Proposers (optimize littles' preferences)")
+        
+        # Only solve with littles as proposers once the user asks for it
+        if st.session_state.littles_proposer_clicked or st.button("Compute littles-as-proposers matching"):
+            if st.session_state.gs_matches_alt is None:
+                st.session_state.gs_matches_alt = solve_gale_shapley(big_prefs, little_prefs, littles_propose=True)
+            st.session_state.littles_proposer_clicked = True
+        matches_alt = st.session_state.gs_matches_alt
+        
+        if matches_alt is not None:
+            # Build the graph for visualization
+            graph_alt = build_match_graph(matches_alt, name_colors)
+            
+            # Display the graph
+            st.subheader("Matching Visualization")
+            st.graphviz_chart(graph_alt)
+            
+            # Display all matches in a table
+            st.subheader("Matches")
+            st.dataframe(matches_df(tuple(matches_alt)))
+    
+    # Compare the two results
+    st.subheader("Comparison")
+    if matches_alt is None:
+        st.info("Compute the littles-as-proposers matching to compare the two results.")
+    elif sorted(matches) != sorted(matches_alt):
+        st.warning("The two solutions are different! This shows how the Gale-Shapley algorithm favors the proposing side.")
+    else:
+        st.success("Both approaches produce the same matching!")
+    
+    # Provide download option for the results
+    st.subheader("Download Results")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.download_button(
+            label="Download Bigs as Proposers Results",
+            data=results_json(tuple(matches), None, "Gale-Shapley Algorithm", "bigs"),
+            file_name="gale_shapley_bigs_proposers.json",
+            mime="application/json"
+        )
+    
+    if matches_alt is not None:
+        with col2:
+            st.download_button(
+                label="Download Littles as Proposers Results",
+                data=results_json(tuple(matches_alt), None, "Gale-Shapley Algorithm", "littles"),
+                file_name="gale_shapley_littles_proposers.json",
+                mime="application/json"
+            )
+
+# Function to display the results of a BigLittleMatcher solve
+def show_matching_results(result):
+    problem_type = result["problem_type"]
+    matches = result["matches"]
+    objective_value = result["objective_value"]
+    instabilities = result["instabilities"]
+    
+    st.header("Matching Results")
+    
+    # Build the graph for visualization
+    name_colors = get_name_colors(result["bigs"], result["littles"])
+    graph = build_match_graph(matches, name_colors, result["scores"])
+    
+    # Display the graph
+    st.subheader("Matching Visualization")
+    st.graphviz_chart(graph)
+    
+    # Display statistics
+    st.subheader("Statistics")
+    st.write("Solver Response:")
+    st.text(result["response_stats"])
+    
+    if problem_type == "Optimized Matching (with Preference Weights)":
+        st.write(f"Total preference score: {objective_value:.2f}")
+    
+    st.write(f"Solve time: {result['solve_time']:.4f} seconds")
+    
+    # Display any instabilities found in the matching
+    if instabilities is None:
+        st.success("The matching is stable by construction - the model's constraints rule out blocking pairs.")
+    elif instabilities:
+        st.warning(f"Found {len(instabilities)} instabilities:")
+        for b, l in instabilities:
+            st.write(f"- ({b}, {l})")
+    else:
+        st.success("No instabilities found - the matching is stable!")
+    
+    # Display all matches in a table
+    st.subheader("Matches")
+    st.dataframe(matches_df(tuple(matches)))
+    
+    # Provide download option for the results
+    st.download_button(
+        label="Download Results as JSON",
+        data=results_json(tuple(matches), objective_value, problem_type),
+        file_name="matching_results.json",
+        mime="application/json"
+    )
+
 # Input data section
 st.header("Input Data")
 
@@ -200,29 +456,28 @@ if input_method == "Use Example Data":
         st.json(little_prefs)
 
 else:  # Enter Custom Data
-    st.markdown("""
-    **Enter your data in JSON format:**
-    - For bigs/littles, you can include a "max" field to specify maximum matches.
-    - For preferences, use ranked lists or dictionaries based on the problem type.
-    """)
+    st.markdown(CUSTOM_DATA_MD)
     
-    # Get example data first to show as placeholders
-    example_bigs, example_littles, example_big_prefs, example_little_prefs = get_example_data(problem_type)
+    # Fill the text areas with example data on first view or when the problem type changes
+    if st.session_state.get("_last_problem") != problem_type or "bigs_text" not in st.session_state:
+        (st.session_state.bigs_text, st.session_state.littles_text,
+         st.session_state.big_prefs_text, st.session_state.little_prefs_text) = EXAMPLE_JSON[problem_type]
+        st.session_state._last_problem = problem_type
     
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Bigs")
-        bigs_text = st.text_area("Enter bigs data (JSON):", height=150, value=json.dumps(example_bigs, indent=2))
+        bigs_text = st.text_area("Enter bigs data (JSON):", height=150, key="bigs_text")
         
         st.subheader("Big Preferences")
-        big_prefs_text = st.text_area("Enter big preferences (JSON):", height=200, value=json.dumps(example_big_prefs, indent=2))
+        big_prefs_text = st.text_area("Enter big preferences (JSON):", height=200, key="big_prefs_text")
     
     with col2:
         st.subheader("Littles")
-        littles_text = st.text_area("Enter littles data (JSON):", height=150, value=json.dumps(example_littles, indent=2))
+        littles_text = st.text_area("Enter littles data (JSON):", height=150, key="littles_text")
         
         st.subheader("Little Preferences")
-        little_prefs_text = st.text_area("Enter little preferences (JSON):", height=200, value=json.dumps(example_little_prefs, indent=2))
+        little_prefs_text = st.text_area("Enter little preferences (JSON):", height=200, key="little_prefs_text")
     
     # Parse the input data when the user clicks "Solve"
     if st.button("Validate Input"):
@@ -240,9 +495,21 @@ if problem_type == "Optimized Matching (with Preference Weights)":
         min_value=0.0, max_value=1.0, value=0.5, step=0.1
     )
     enforce_exactly_one = st.checkbox("Enforce exactly one match per participant", value=False)
+else:
+    preference_weight = None
+    enforce_exactly_one = None
+
+# The inputs a solve would use right now; stored results are only shown while these still match
+current_inputs = inputs_key(
+    problem_type, input_method,
+    None if input_method == "Use Example Data" else (bigs_text, littles_text, big_prefs_text, little_prefs_text),
+    preference_weight, enforce_exactly_one
+)
 
 # Solve button
-if st.button("Solve Matching Problem"):
+st.button("Solve Matching Problem", key="solve_clicked")
+
+if st.session_state.get("solve_clicked"):
     with st.spinner("Solving..."):
         if input_method == "Use Example Data":
             # Use example data
@@ -256,228 +523,82 @@ if st.button("Solve Matching Problem"):
         if problem_type == "Gale-Shapley Algorithm":
             # For Gale-Shapley we only need preference lists
             if not all([big_prefs, little_prefs]):
+                st.session_state.gs_matches = None
                 st.error("Invalid input data. Please check your JSON format for preference lists.")
             else:
                 # Prepare data for Gale-Shapley
                 # For Gale-Shapley, we need simple preference lists
                 if input_method == "Enter Custom Data":
                     # Convert preferences to lists if they're not already
-                    if isinstance(list(big_prefs.values())[0], dict):
-                        # Convert from dict to list format
-                        big_prefs_lists = {}
-                        for big, prefs in big_prefs.items():
-                            # Sort by preference value (lower is better)
-                            big_prefs_lists[big] = [p for p, _ in sorted(prefs.items(), key=lambda x: x[1])]
-                        big_prefs = big_prefs_lists
-                        
-                        little_prefs_lists = {}
-                        for little, prefs in little_prefs.items():
-                            # Sort by preference value (lower is better)
-                            little_prefs_lists[little] = [p for p, _ in sorted(prefs.items(), key=lambda x: x[1])]
-                        little_prefs = little_prefs_lists
+                    if isinstance(next(iter(big_prefs.values())), dict):
+                        # Convert from dict to list format, sorting by preference value (lower is better)
+                        big_prefs = {
+                            big: [p for p, _ in sorted(prefs.items(), key=itemgetter(1))]
+                            for big, prefs in big_prefs.items()
+                        }
+                        little_prefs = {
+                            little: [p for p, _ in sorted(prefs.items(), key=itemgetter(1))]
+                            for little, prefs in little_prefs.items()
+                        }
                 
                 try:
-                    # Create GaleShapley instance with bigs as proposers
-                    gs = GaleShapley(big_prefs, little_prefs)
-                    matches = gs.match()
+                    # Run Gale-Shapley with bigs as proposers; the littles side is computed on demand
+                    matches = solve_gale_shapley(big_prefs, little_prefs)
                     
                     # Store matches and preferences in session state
-                    st.session_state.gs_matches = matches
-                    st.session_state.big_prefs = big_prefs
-                    st.session_state.little_prefs = little_prefs
-                    st.session_state.show_littles_as_proposers = True
-                    
-                    # Display results
-                    st.header("Gale-Shapley Results")
-                    
-                    # Create tabs for the two different approaches
-                    tab1, tab2 = st.tabs(["Bigs as Proposers", "Littles as Proposers"])
-                    
-                    with tab1:
-                        st.markdown("### Bigs as Proposers (optimize bigs' preferences)")
-                        
-                        # Create a graphviz object for visualization
-                        graph = graphviz.Graph()
-                        COLORS = ['aqua', 'coral', 'darkgreen', 'gold', 'darkolivegreen1',
-                                'deeppink', 'crimson', 'darkorchid', 'bisque', 'yellow']
-                        
-                        # Add edges and nodes to the graph
-                        for big, little in matches:
-                            graph.edge(f'{big}', f'{little}', penwidth="1")
-                            graph.node(f'{big}', color=COLORS[hash(big) % len(COLORS)])
-                            graph.node(f'{little}', color=COLORS[hash(little) % len(COLORS)])
-                        
-                        # Display the graph
-                        st.subheader("Matching Visualization")
-                        render_graphviz(graph)
-                        
-                        # Display all matches in a table
-                        st.subheader("Matches")
-                        match_data = []
-                        for big, little in matches:
-                            match_data.append({"Big": big, "Little": little})
-                        
-                        st.table(match_data)
-                    
-                    with tab2:
-                        st.markdown("### Littles as Proposers (optimize littles' preferences)")
-                        
-                        # Create GaleShapley with littles as proposers
-                        gs_alt = GaleShapley(little_prefs, big_prefs)
-                        matches_alt = gs_alt.match()
-                        
-                        # Invert the matches to maintain big->little format
-                        matches_alt = [(little, big) for big, little in matches_alt]
-                        
-                        # Create a graphviz object for visualization
-                        graph_alt = graphviz.Graph()
-                        
-                        # Add edges and nodes to the graph
-                        for big, little in matches_alt:
-                            graph_alt.edge(f'{big}', f'{little}', penwidth="1")
-                            graph_alt.node(f'{big}', color=COLORS[hash(big) % len(COLORS)])
-                            graph_alt.node(f'{little}', color=COLORS[hash(little) % len(COLORS)])
-                        
-                        # Display the graph
-                        st.subheader("Matching Visualization")
-                        render_graphviz(graph_alt)
-                        
-                        # Display all matches in a table
-                        st.subheader("Matches")
-                        match_data_alt = []
-                        for big, little in matches_alt:
-                            match_data_alt.append({"Big": big, "Little": little})
-                        
-                        st.table(match_data_alt)
-                    
-                    # Compare the two results
-                    st.subheader("Comparison")
-                    different = set(matches) != set(matches_alt)
-                    if different:
-                        st.warning("The two solutions are different! This shows how the Gale-Shapley algorithm favors the proposing side.")
-                    else:
-                        st.success("Both approaches produce the same matching!")
-                    
-                    # Provide download option for the results
-                    st.subheader("Download Results")
-                    col1, col2 = st.columns(2)
-                    
-                    def to_json_file(matches, proposers):
-                        result = {
-                            "matches": [{"big": b, "little": l} for b, l in matches],
-                            "problem_type": "Gale-Shapley Algorithm",
-                            "proposers": proposers
-                        }
-                        return json.dumps(result, indent=2)
-                    
-                    with col1:
-                        st.download_button(
-                            label="Download Bigs as Proposers Results",
-                            data=to_json_file(matches, "bigs"),
-                            file_name="gale_shapley_bigs_proposers.json",
-                            mime="application/json"
-                        )
-                    
-                    with col2:
-                        st.download_button(
-                            label="Download Littles as Proposers Results",
-                            data=to_json_file(matches_alt, "littles"),
-                            file_name="gale_shapley_littles_proposers.json",
-                            mime="application/json"
-                        )
+                    st.session_state.update({
+                        'gs_matches': matches,
+                        'gs_matches_alt': None,
+                        'littles_proposer_clicked': False,
+                        'big_prefs': big_prefs,
+                        'little_prefs': little_prefs,
+                        'gs_inputs': current_inputs,
+                        'show_littles_as_proposers': True
+                    })
                     
                 except Exception as e:
+                    st.session_state.gs_matches = None
                     st.error(f"Error solving with Gale-Shapley: {str(e)}")
         elif not all([bigs, littles, big_prefs, little_prefs]):
+            st.session_state.last_result = None
             st.error("Invalid input data. Please check your JSON format.")
         else:
-            # Create the matcher for other algorithms
-            matcher = BigLittleMatcher(bigs, littles, big_prefs, little_prefs)
-            
-            # Build the appropriate model based on the problem type
-            if problem_type == "Classic Stable Matching (SMP)":
-                matcher.build_model()
-            elif problem_type == "Stable Matching with Ties (SMT)":
-                matcher.build_model_smt()
-            elif problem_type == "Stable Matching with Ties and Incomplete Lists (SMTI)":
-                matcher.build_model_smti()
-            elif problem_type == "SMTI with Optional Matching":
-                matcher.build_model_smi_two()
-            else:  # Optimized Matching
-                matcher.build_model_optimize(
+            try:
+                # Build and solve the model for the selected problem type
+                matches, objective_value, solve_time, response_stats, instabilities, scores = solve_problem(
+                    problem_type, canon((bigs, littles, big_prefs, little_prefs)),
                     preference_weight=preference_weight,
                     enforce_exactly_one=enforce_exactly_one
                 )
-            
-            try:
-                # Solve the model
-                matches, objective_value, solve_time = matcher.solve()
-                
-                # Display results
-                st.header("Matching Results")
-                
-                # Create a graphviz object for visualization
-                graph = graphviz.Graph()
-                COLORS = ['aqua', 'coral', 'darkgreen', 'gold', 'darkolivegreen1',
-                        'deeppink', 'crimson', 'darkorchid', 'bisque', 'yellow']
                 
-                # Add edges and nodes to the graph
-                for b, l in matches:
-                    penwidth = str(matcher.scores.get((b, l), 1)) if hasattr(matcher, 'scores') else "1"
-                    graph.edge(f'{b}', f'{l}', penwidth=penwidth)
-                    graph.node(f'{b}', color=COLORS[hash(b) % len(COLORS)])
-                    graph.node(f'{l}', color=COLORS[hash(l) % len(COLORS)])
-                
-                # Display the graph
-                st.subheader("Matching Visualization")
-                render_graphviz(graph)
-                
-                # Display statistics
-                st.subheader("Statistics")
-                st.write("Solver Response:")
-                st.text(matcher.solver.ResponseStats())
-                
-                if problem_type == "Optimized Matching (with Preference Weights)":
-                    st.write(f"Total preference score: {objective_value:.2f}")
-                
-                st.write(f"Solve time: {solve_time:.4f} seconds")
-                
-                # Check for instabilities and display them
-                instabilities = matcher.check_instabilities(matches)
-                if instabilities:
-                    st.warning(f"Found {len(instabilities)} instabilities:")
-                    for b, l in instabilities:
-                        st.write(f"- ({b}, {l})")
-                else:
-                    st.success("No instabilities found - the matching is stable!")
-                
-                # Display all matches in a table
-                st.subheader("Matches")
-                match_data = []
-                for b, l in matches:
-                    match_data.append({"Big": b, "Little": l})
-                
-                st.table(match_data)
-                
-                # Provide download option for the results
-                def to_json_file(matches, objective_value):
-                    result = {
-                        "matches": [{"big": b, "little": l} for b, l in matches],
-                        "objective_value": float(objective_value),
-                        "problem_type": problem_type
-                    }
-                    return json.dumps(result, indent=2)
-                
-                st.download_button(
-                    label="Download Results as JSON",
-                    data=to_json_file(matches, objective_value),
-                    file_name="matching_results.json",
-                    mime="application/json"
-                )
+                # Store the result in session state so it survives widget reruns
+                st.session_state.last_result = {
+                    "problem_type": problem_type,
+                    "inputs": current_inputs,
+                    "bigs": bigs,
+                    "littles": littles,
+                    "matches": matches,
+                    "objective_value": objective_value,
+                    "solve_time": solve_time,
+                    "response_stats": response_stats,
+                    "instabilities": instabilities,
+                    "scores": scores
+                }
                 
             except Exception as e:
+                st.session_state.last_result = None
                 st.error(f"Error solving the model: {str(e)}")
 
+# Display the latest results from session state without re-solving, as long as the inputs haven't changed since
+if problem_type == "Gale-Shapley Algorithm":
+    if (st.session_state.show_littles_as_proposers and st.session_state.gs_matches is not None
+            and st.session_state.gs_inputs == current_inputs):
+        show_gale_shapley_results(
+            st.session_state.gs_matches, st.session_state.big_prefs, st.session_state.little_prefs
+        )
+elif st.session_state.last_result is not None and st.session_state.last_result["inputs"] == current_inputs:
+    show_matching_results(st.session_state.last_result)
+
 # Add footer
 st.markdown("---")
 st.markdown("Built with Streamlit by [Zora Mardjoko](https://github.com/zoramardjoko) and [Kevin He](https://github.com/Haokius)") 
\ No newline at end of file
@@ -1,9 +1,56 @@
 from ortools.sat.python import cp_model
 import graphviz
-from collections import defaultdict
 from IPython.display import display
-from typing import List, Dict
+from typing import Dict
 import time
+import sys
+import numpy as np
+from galeshapely import GaleShapley
+
+# Colors used to tell participants apart in pretty_print
+COLORS = ('aqua', 'coral', 'darkgreen', 'gold', 'darkolivegreen1',
+          'deeppink', 'crimson', 'darkorchid', 'bisque', 'yellow')
+
+# Rank given to unranked participants in the pure-Python instability check; an int keeps comparisons int-only
+_INF = sys.maxsize
+
+# Number of (big, little) pairs (about 1000 x 1000) from which check_instabilities uses the numba kernel;
+# below it the pure-Python check finishes faster than importing numba and filling the rank matrices
+_COMPILED_MIN_PAIRS = 1_000_000
+
+# Compiled blocking-pair kernel once loaded, False if numba isn't installed, None if not tried yet
+_compiled_mask = None
+
+
+def _blocking_pair_mask(big_rank, little_rank, big_match_rank, little_match_rank):
+    """
+    Flag every (b, l) pair where both strictly prefer each other to their current match.
+    
+    big_rank[i, j] is big i's rank of little j, little_rank[i, j] is little j's rank of big i,
+    and the match ranks are the rank each participant gives their current match
+    (inf if unranked, nan if unmatched so the comparisons are always false).
+    """
+    n_bigs, n_littles = big_rank.shape
+    mask = np.zeros((n_bigs, n_littles), dtype=np.bool_)
+    for i in range(n_bigs):
+        for j in range(n_littles):
+            if big_rank[i, j] < big_match_rank[i] and little_rank[i, j] < little_match_rank[j]:
+                mask[i, j] = True
+    return mask
+
+
+
+def _load_compiled_mask():
+    """Compile (or load from numba's cache) the blocking-pair kernel on first use; None if numba is missing"""
+    global _compiled_mask
+    if _compiled_mask is None:
+        try:
+            from numba import njit
+        except ImportError:  # numba is optional; check_instabilities falls back to pure Python
+            _compiled_mask = False
+        else:
+            _compiled_mask = njit(cache=True)(_blocking_pair_mask)
+    return _compiled_mask or None
 
 
 class BigLittleMatcher:
@@ -12,38 +59,149 @@ class BigLittleMatcher:
         self.littles = littles
         self.big_prefs = big_prefs
         self.little_prefs = little_prefs
+        # Canonical rank dicts (participant -> partner -> rank) for list or dict preferences
+        self._big_rank = {b: self._ranks(prefs) for b, prefs in big_prefs.items()}
+        self._little_rank = {l: self._ranks(prefs) for l, prefs in little_prefs.items()}
         self.model = cp_model.CpModel()
         self.x = {}
+        # Integer ids for participants; self._x[i][j] is the variable for matching big i with little j
+        self._big_names = list(self.bigs)
+        self._little_names = list(self.littles)
+        self._x = []
         self.scores = {}
         self.max_rank_b = len(self.littles)
         self.max_rank_l = len(self.bigs)
         self.solver = cp_model.CpSolver()
+        # Strict preference lists (bigs', littles') for seeding the solver, set by models where Gale-Shapley's matching is feasible
+        self._warm_start_prefs = None
 
-    def solve(self):
+    def solve(self, use_warm_start=True, workers=None, linearization_level=None):
+        # Only override the solver's parameters when asked; a deeper linearization can make SMTI much slower
+        if workers is not None:
+            self.solver.parameters.num_workers = workers
+        if linearization_level is not None:
+            self.solver.parameters.linearization_level = linearization_level
+        if use_warm_start and self._warm_start_prefs is not None:
+            self._add_gale_shapley_hint()
         start_time = time.time()
         status = self.solver.Solve(self.model)
-        if status != cp_model.OPTIMAL:
+        return self._collect_results(status, self.solver, start_time)
+
+    def resolve(self, params=None):
+        """
+        Solve the already-built model again with different solver parameters.
+        
+        params maps CP-SAT parameter names to values (e.g. {'num_workers': 1}). The run uses its own
+        CpSolver, so self.solver and pretty_print keep the parameters and results of the last solve().
+        """
+        solver = cp_model.CpSolver()
+        for name, value in (params or {}).items():
+            setattr(solver.parameters, name, value)
+        start_time = time.time()
+        status = solver.Solve(self.model)
+        return self._collect_results(status, solver, start_time)
+
+    def _collect_results(self, status, solver, start_time):
+        """Turn a solver's status into (matches, objective value, elapsed time)"""
+        # Stability-only models have no objective, so any feasible assignment is a solution
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
             raise ValueError('Not possible!')
-        matches = [(b, l) for (b, l), var in self.x.items() if self.solver.Value(var)]
+        matches = [
+            (self._big_names[i], self._little_names[j])
+            for i, row in enumerate(self._x) for j, var in enumerate(row) if solver.Value(var)
+        ]
         end_time = time.time()
-        return matches, self.solver.ObjectiveValue(), end_time - start_time
+        objective_value = solver.ObjectiveValue() if self.model.HasObjective() else 0.0
+        return matches, objective_value, end_time - start_time
 
     def pretty_print(self):
         print(self.solver.ResponseStats())
         score_achieved = self.solver.ObjectiveValue()
         print(f"Total preference score: {score_achieved:.0f}")
-        COLORS = ['aqua', 'coral', 'darkgreen', 'gold', 'darkolivegreen1',
-                    'deeppink', 'crimson', 'darkorchid', 'bisque', 'yellow']
         G = graphviz.Graph()
+        color_of = {node: COLORS[hash(node) % len(COLORS)] for node in set(self.bigs) | set(self.littles)}
+        seen = set()
         for (b, l), var in self.x.items():
             if self.solver.Value(var):
                 # Use default penwidth of 1 if scores dict doesn't exist or doesn't have the pair
                 penwidth = str(self.scores.get((b, l), 1)) if hasattr(self, 'scores') else "1"
                 G.edge(f'{b}', f'{l}', penwidth=penwidth)
-                G.node(f'{b}', color=COLORS[hash(b) % len(COLORS)])
-                G.node(f'{l}', color=COLORS[hash(l) % len(COLORS)])
+                # Participants with several matches only need their node declared once
+                for node in (b, l):
+                    if node not in seen:
+                        seen.add(node)
+                        G.node(f'{node}', color=color_of[node])
         display(G)
 
+    def _add_gale_shapley_hint(self):
+        """Hint the Gale-Shapley matching to the solver, which is already a feasible stable matching"""
+        big_lists, little_lists = self._warm_start_prefs
+        self.model.ClearHints()
+        try:
+            gs_matches = set(GaleShapley(big_lists, little_lists).match())
+        except KeyError:
+            # Gale-Shapley needs complete lists; without them just solve unhinted
+            return
+        for pair, var in self.x.items():
+            self.model.AddHint(var, pair in gs_matches)
+
+    def _create_match_vars(self):
+        """Create a variable per (big, little) pair, indexed by id in self._x and by name in self.x"""
+        self._x = [
+            [self.model.NewBoolVar(f"x_{b}_{l}") for l in self._little_names]
+            for b in self._big_names
+        ]
+        self.x = {
+            (b, l): var
+            for b, row in zip(self._big_names, self._x) for l, var in zip(self._little_names, row)
+        }
+
+    @staticmethod
+    def _rank_tiers(prefs, partners, max_rank):
+        """Map each rank in prefs to the partners ranked at that rank or better"""
+        ordered = sorted(partners, key=lambda p: prefs.get(p, max_rank))
+        ends = {}
+        for i, p in enumerate(ordered):
+            ends[prefs.get(p, max_rank)] = i + 1
+        return {rank: ordered[:end] for rank, end in ends.items()}
+
+    def _ranked_pairs_only(self):
+        """Rank dicts for incomplete lists, where a missing entry or a rank of max_rank means unranked"""
+        big_rank_of = {
+            b: {l: r for l, r in self.big_prefs.get(b, {}).items() if r != self.max_rank_b} for b in self.bigs
+        }
+        little_rank_of = {
+            l: {b: r for b, r in self.little_prefs.get(l, {}).items() if r != self.max_rank_l} for l in self.littles
+        }
+        return big_rank_of, little_rank_of
+
+    def _add_stability_clauses(self, big_rank_of, little_rank_of, skip_implied=True):
+        """
+        Add one stability clause per mutually ranked pair: b or l is matched to someone they rank equally or better.
+        
+        big_rank_of[b] and little_rank_of[l] map each partner they rank to its rank (lower is better);
+        pairs missing from either side get no clause. With skip_implied, clauses spanning a participant's
+        whole row are left out, which is only valid when everyone is matched exactly once.
+        """
+        # The partners ranked at r or better depend only on r, so build each list once per participant
+        big_tiers = {b: self._rank_tiers(big_rank_of[b], self.littles, self.max_rank_b) for b in self.bigs}
+        little_tiers = {l: self._rank_tiers(little_rank_of[l], self.bigs, self.max_rank_l) for l in self.littles}
+        
+        for b in self.bigs:
+            for l in self.littles:
+                if l not in big_rank_of[b] or b not in little_rank_of[l]:
+                    continue
+                
+                # This includes x[b, l] itself
+                preferred_littles = big_tiers[b][big_rank_of[b][l]]
+                preferred_bigs = little_tiers[l][little_rank_of[l][b]]
+                if skip_implied and (len(preferred_littles) == len(self.littles) or len(preferred_bigs) == len(self.bigs)):
+                    continue
+                self.model.AddBoolOr(
+                    [self.x[(b, l_prime)] for l_prime in preferred_littles]
+                    + [self.x[(b_prime, l)] for b_prime in preferred_bigs if b_prime != b]
+                )
+
     def build_model(self):
         """
         Build model for classic Stable Marriage problem.
@@ -56,47 +214,50 @@ class BigLittleMatcher:
              a) b must be matched with someone they prefer to l, or
              b) l must be matched with someone they prefer to b
         """
-        for b in self.bigs:
-            for l in self.littles:
-                self.x[(b, l)] = self.model.NewBoolVar(f"x_{b}_{l}")
+        self._warm_start_prefs = (self.big_prefs, self.little_prefs)
+        self._create_match_vars()
+        x = self._x
+        n_bigs, n_littles = len(self._big_names), len(self._little_names)
+        
+        # Rank tables by id: big_rank[i][j] is big i's rank of little j, little_rank[j][i] is little j's rank of big i
+        little_ids = {l: j for j, l in enumerate(self._little_names)}
+        big_ids = {b: i for i, b in enumerate(self._big_names)}
+        big_rank = [[n_littles] * n_littles for _ in range(n_bigs)]
+        little_rank = [[n_bigs] * n_bigs for _ in range(n_littles)]
+        for i, b in enumerate(self._big_names):
+            for l, rank in self._big_rank[b].items():
+                if l in little_ids:
+                    big_rank[i][little_ids[l]] = rank
+        for j, l in enumerate(self._little_names):
+            for b, rank in self._little_rank[l].items():
+                if b in big_ids:
+                    little_rank[j][big_ids[b]] = rank
 
-        for b in self.bigs:
-            self.model.Add(sum(self.x[(b, l)] for l in self.littles) == 1)
+        for i in range(n_bigs):
+            self.model.AddExactlyOne(x[i])
         
-        for l in self.littles:
-            self.model.Add(sum(self.x[(b, l)] for b in self.bigs) == 1)
+        for j in range(n_littles):
+            self.model.AddExactlyOne(x[i][j] for i in range(n_bigs))
 
-        for b in self.bigs:
-            for l in self.littles:
-                not_matched = self.model.NewBoolVar(f"not_matched_{b}_{l}")
-                self.model.Add(self.x[(b, l)] == 0).OnlyEnforceIf(not_matched)
-                self.model.Add(self.x[(b, l)] == 1).OnlyEnforceIf(not_matched.Not())
-                
-                b_with_better = self.model.NewBoolVar(f"b{b}_with_better_{l}")
-                preferred_littles = [
-                    l_prime for l_prime in self.littles 
-                    if self.big_prefs[b].index(l_prime) < self.big_prefs[b].index(l)
+        for i in range(n_bigs):
+            for j in range(n_littles):
+                # Stability: b is matched to someone at least as good as l,
+                # or l is matched to someone at least as good as b (this includes x[b, l] itself)
+                preferred_or_equal_littles = [
+                    j_prime for j_prime in range(n_littles) 
+                    if big_rank[i][j_prime] <= big_rank[i][j]
                 ]
-                if preferred_littles:
-                    self.model.Add(sum(self.x[(b, l_prime)] for l_prime in preferred_littles) >= 1).OnlyEnforceIf(b_with_better)
-                    self.model.Add(sum(self.x[(b, l_prime)] for l_prime in preferred_littles) == 0).OnlyEnforceIf(b_with_better.Not())
-                else:
-                    self.model.Add(b_with_better == 0)
-                
-                l_with_better = self.model.NewBoolVar(f"l{l}_with_better_{b}")
-                preferred_bigs = [
-                    b_prime for b_prime in self.bigs 
-                    if self.little_prefs[l].index(b_prime) < self.little_prefs[l].index(b)
+                preferred_or_equal_bigs = [
+                    i_prime for i_prime in range(n_bigs) 
+                    if i_prime != i and little_rank[j][i_prime] <= little_rank[j][i]
                 ]
-                if preferred_bigs:
-                    self.model.Add(sum(self.x[(b_prime, l)] for b_prime in preferred_bigs) >= 1).OnlyEnforceIf(l_with_better)
-                    self.model.Add(sum(self.x[(b_prime, l)] for b_prime in preferred_bigs) == 0).OnlyEnforceIf(l_with_better.Not())
-                else:
-                    self.model.Add(l_with_better == 0)
-                
-                self.model.AddBoolOr([not_matched.Not(), b_with_better, l_with_better])
-
-        self.model.Maximize(0)
+                # Everyone is matched exactly once, so a clause spanning b's or l's whole row is already implied
+                if len(preferred_or_equal_littles) == n_littles or len(preferred_or_equal_bigs) == n_bigs - 1:
+                    continue
+                self.model.AddBoolOr(
+                    [x[i][j_prime] for j_prime in preferred_or_equal_littles]
+                    + [x[i_prime][j] for i_prime in preferred_or_equal_bigs]
+                )
 
     def build_model_smt(self):
         """
@@ -115,43 +276,20 @@ class BigLittleMatcher:
              a) b must be matched with someone they rank equally or better than l, or
              b) l must be matched with someone they rank equally or better than b
         """
-        for b in self.bigs:
-            for l in self.littles:
-                self.x[(b, l)] = self.model.NewBoolVar(f"x_{b}_{l}")
+        self._create_match_vars()
         
         for b in self.bigs:
-            self.model.Add(sum(self.x[(b, l)] for l in self.littles) == 1)
+            self.model.AddExactlyOne(self.x[(b, l)] for l in self.littles)
         for l in self.littles:
-            self.model.Add(sum(self.x[(b, l)] for b in self.bigs) == 1)
+            self.model.AddExactlyOne(self.x[(b, l)] for b in self.bigs)
         
-        for b in self.bigs:
-            for l in self.littles:
-                b_rank_of_l = self.big_prefs[b][l]
-                l_rank_of_b = self.little_prefs[l][b]
-                
-                not_matched = self.model.NewBoolVar(f"not_matched_{b}_{l}")
-                self.model.Add(self.x[(b, l)] == 0).OnlyEnforceIf(not_matched)
-                self.model.Add(self.x[(b, l)] == 1).OnlyEnforceIf(not_matched.Not())
-                
-                b_with_better_or_equal = self.model.NewBoolVar(f"b{b}_with_geq_{l}")
-                preferred_littles = [
-                    l_prime for l_prime in self.littles 
-                    if self.big_prefs[b][l_prime] <= b_rank_of_l
-                ]
-                self.model.Add(sum(self.x[(b, l_prime)] for l_prime in preferred_littles) >= 1).OnlyEnforceIf(b_with_better_or_equal)
-                self.model.Add(sum(self.x[(b, l_prime)] for l_prime in preferred_littles) == 0).OnlyEnforceIf(b_with_better_or_equal.Not())
-                
-                l_with_better_or_equal = self.model.NewBoolVar(f"l{l}_with_geq_{b}")
-                preferred_bigs = [
-                    b_prime for b_prime in self.bigs 
-                    if self.little_prefs[l][b_prime] <= l_rank_of_b
-                ]
-                self.model.Add(sum(self.x[(b_prime, l)] for b_prime in preferred_bigs) >= 1).OnlyEnforceIf(l_with_better_or_equal)
-                self.model.Add(sum(self.x[(b_prime, l)] for b_prime in preferred_bigs) == 0).OnlyEnforceIf(l_with_better_or_equal.Not())
-                
-                self.model.AddBoolOr([not_matched.Not(), b_with_better_or_equal, l_with_better_or_equal])
+        self._add_stability_clauses(self.big_prefs, self.little_prefs)
         
-        self.model.Maximize(0)
+        # Breaking ties arbitrarily gives strict lists whose stable matching is also stable with ties
+        self._warm_start_prefs = (
+            {b: sorted(self.littles, key=self.big_prefs[b].get) for b in self.bigs},
+            {l: sorted(self.bigs, key=self.little_prefs[l].get) for l in self.littles},
+        )
 
     def build_model_smti(self):
         """
@@ -171,46 +309,14 @@ class BigLittleMatcher:
              a) b must be matched with someone they rank equally or better than l, or
              b) l must be matched with someone they rank equally or better than b
         """
-        for b in self.bigs:
-            for l in self.littles:
-                self.x[(b, l)] = self.model.NewBoolVar(f"x_{b}_{l}")
+        self._create_match_vars()
         
         for b in self.bigs:
-            self.model.Add(sum(self.x[(b, l)] for l in self.littles) == 1)
+            self.model.AddExactlyOne(self.x[(b, l)] for l in self.littles)
         for l in self.littles:
-            self.model.Add(sum(self.x[(b, l)] for b in self.bigs) == 1)
+            self.model.AddExactlyOne(self.x[(b, l)] for b in self.bigs)
         
-        for b in self.bigs:
-            for l in self.littles:
-                b_rank_of_l = self.big_prefs.get(b, {}).get(l, self.max_rank_b)
-                l_rank_of_b = self.little_prefs.get(l, {}).get(b, self.max_rank_l)
-                
-                if b_rank_of_l == self.max_rank_b or l_rank_of_b == self.max_rank_l:
-                    continue
-                    
-                not_matched = self.model.NewBoolVar(f"not_matched_{b}_{l}")
-                self.model.Add(self.x[(b, l)] == 0).OnlyEnforceIf(not_matched)
-                self.model.Add(self.x[(b, l)] == 1).OnlyEnforceIf(not_matched.Not())
-                
-                b_with_better_or_equal = self.model.NewBoolVar(f"b{b}_with_geq_{l}")
-                preferred_littles = [
-                    l_prime for l_prime in self.littles 
-                    if self.big_prefs.get(b, {}).get(l_prime, self.max_rank_b) <= b_rank_of_l
-                ]
-                self.model.Add(sum(self.x[(b, l_prime)] for l_prime in preferred_littles) >= 1).OnlyEnforceIf(b_with_better_or_equal)
-                self.model.Add(sum(self.x[(b, l_prime)] for l_prime in preferred_littles) == 0).OnlyEnforceIf(b_with_better_or_equal.Not())
-                
-                l_with_better_or_equal = self.model.NewBoolVar(f"l{l}_with_geq_{b}")
-                preferred_bigs = [
-                    b_prime for b_prime in self.bigs 
-                    if self.little_prefs.get(l, {}).get(b_prime, self.max_rank_l) <= l_rank_of_b
-                ]
-                self.model.Add(sum(self.x[(b_prime, l)] for b_prime in preferred_bigs) >= 1).OnlyEnforceIf(l_with_better_or_equal)
-                self.model.Add(sum(self.x[(b_prime, l)] for b_prime in preferred_bigs) == 0).OnlyEnforceIf(l_with_better_or_equal.Not())
-                
-                self.model.AddBoolOr([not_matched.Not(), b_with_better_or_equal, l_with_better_or_equal])
-        
-        self.model.Maximize(0)
+        self._add_stability_clauses(*self._ranked_pairs_only())
 
     def build_model_smi_two(self):
         """
@@ -231,45 +337,16 @@ class BigLittleMatcher:
              a) b must be matched with someone they rank equally or better than l, or
              b) l must be matched with someone they rank equally or better than b
         """
-        for b in self.bigs:
-            for l in self.littles:
-                self.x[(b, l)] = self.model.NewBoolVar(f"x_{b}_{l}")
+        self._create_match_vars()
         
         # we check make it <= 1, so now not everyone has to be matched.
         for b in self.bigs:
-            self.model.Add(sum(self.x[(b, l)] for l in self.littles) <= 1)
+            self.model.AddAtMostOne(self.x[(b, l)] for l in self.littles)
         for l in self.littles:
-            self.model.Add(sum(self.x[(b, l)] for b in self.bigs) <= 1)
+            self.model.AddAtMostOne(self.x[(b, l)] for b in self.bigs)
         
-        for b in self.bigs:
-            for l in self.littles:
-                b_rank_of_l = self.big_prefs.get(b, {}).get(l, self.max_rank_b)
-                l_rank_of_b = self.little_prefs.get(l, {}).get(b, self.max_rank_l)
-                
-                if b_rank_of_l == self.max_rank_b or l_rank_of_b == self.max_rank_l:
-                    continue
-                    
-                not_matched = self.model.NewBoolVar(f"not_matched_{b}_{l}")
-                self.model.Add(self.x[(b, l)] == 0).OnlyEnforceIf(not_matched)
-                self.model.Add(self.x[(b, l)] == 1).OnlyEnforceIf(not_matched.Not())
-                
-                b_with_better_or_equal = self.model.NewBoolVar(f"b{b}_with_geq_{l}")
-                preferred_littles = [
-                    l_prime for l_prime in self.littles 
-                    if self.big_prefs.get(b, {}).get(l_prime, self.max_rank_b) <= b_rank_of_l
-                ]
-                self.model.Add(sum(self.x[(b, l_prime)] for l_prime in preferred_littles) >= 1).OnlyEnforceIf(b_with_better_or_equal)
-                self.model.Add(sum(self.x[(b, l_prime)] for l_prime in preferred_littles) == 0).OnlyEnforceIf(b_with_better_or_equal.Not())
-                
-                l_with_better_or_equal = self.model.NewBoolVar(f"l{l}_with_geq_{b}")
-                preferred_bigs = [
-                    b_prime for b_prime in self.bigs 
-                    if self.little_prefs.get(l, {}).get(b_prime, self.max_rank_l) <= l_rank_of_b
-                ]
-                self.model.Add(sum(self.x[(b_prime, l)] for b_prime in preferred_bigs) >= 1).OnlyEnforceIf(l_with_better_or_equal)
-                self.model.Add(sum(self.x[(b_prime, l)] for b_prime in preferred_bigs) == 0).OnlyEnforceIf(l_with_better_or_equal.Not())
-                
-                self.model.AddBoolOr([not_matched.Not(), b_with_better_or_equal, l_with_better_or_equal])
+        # Not everyone is matched, so clauses spanning a whole row are not implied
+        self._add_stability_clauses(*self._ranked_pairs_only(), skip_implied=False)
         
         # we want to minimize the sum of the ranks.
         # Create a dictionary to store the ranks of matched pairs
@@ -293,15 +370,13 @@ class BigLittleMatcher:
 
     def build_model_optimize(self, preference_weight: float = 0.5, enforce_exactly_one: bool = False):
         #x[(b, l)] is 1 if big b is matched with little l
-        for b in self.bigs:
-            for l in self.littles:
-                self.x[(b, l)] = self.model.NewBoolVar(f"x_{b}_{l}")
+        self._create_match_vars()
         
         for l in self.littles:
             vars_l = [self.x[(b, l)] for b in self.bigs]
             # each little must be matched to exactly one big
             if enforce_exactly_one:
-                self.model.Add(sum(vars_l) == 1)
+                self.model.AddExactlyOne(vars_l)
             # there are twins
             else:
                 self.model.Add(sum(vars_l) >= 1)
@@ -311,24 +386,35 @@ class BigLittleMatcher:
             vars_b = [self.x[(b, l)] for l in self.littles]
             # if exact matching
             if enforce_exactly_one:
-                self.model.Add(sum(vars_b) == 1)
+                self.model.AddExactlyOne(vars_b)
             # each big must be matched to at least one little
             # and no more than their max
             else:
                 self.model.Add(sum(vars_b) >= 1)
                 self.model.Add(sum(vars_b) <= self.bigs[b].get('max', 1))
 
-        for b in self.bigs:
-            for l in self.littles:
-                # lower rank means higher preference
-                # assigns max_rank to unranked people
-                rank_b = self.big_prefs.get(b, []).index(l) if l in self.big_prefs.get(b, []) else self.max_rank_b
-                rank_l = self.little_prefs.get(l, []).index(b) if b in self.little_prefs.get(l, []) else self.max_rank_l
-
-                score = (
-                    preference_weight * (self.max_rank_b - rank_b)
-                    + (1 - preference_weight) * (self.max_rank_l - rank_l)
-                )
+        # lower rank means higher preference
+        # assigns max_rank to unranked people
+        big_idx = {b: i for i, b in enumerate(self.bigs)}
+        little_idx = {l: j for j, l in enumerate(self.littles)}
+        rank_b = np.full((len(big_idx), len(little_idx)), self.max_rank_b)
+        rank_l = np.full((len(little_idx), len(big_idx)), self.max_rank_l)
+        for b, i in big_idx.items():
+            # Walk the list backwards so a repeated name keeps its first (best) rank
+            for rank, l in reversed(list(enumerate(self.big_prefs.get(b, [])))):
+                if l in little_idx:
+                    rank_b[i, little_idx[l]] = rank
+        for l, j in little_idx.items():
+            for rank, b in reversed(list(enumerate(self.little_prefs.get(l, [])))):
+                if b in big_idx:
+                    rank_l[j, big_idx[b]] = rank
+
+        score_arr = (
+            preference_weight * (self.max_rank_b - rank_b)
+            + (1 - preference_weight) * (self.max_rank_l - rank_l.T)
+        )
+        for b, row in zip(big_idx, score_arr.tolist()):
+            for l, score in zip(little_idx, row):
                 self.scores[(b, l)] = score
 
         self.model.Maximize(sum(self.scores[(b, l)] * self.x[(b, l)] for (b, l) in self.x))
@@ -337,43 +423,69 @@ class BigLittleMatcher:
         if not matches:
             return []
             
-        # Check the type of preference structure we're using
-        first_big = list(self.big_prefs.keys())[0]
-        if isinstance(self.big_prefs[first_big], list):
-            return self._check_instabilities_list_prefs(matches)
-        else:
-            return self._check_instabilities_dict_prefs(matches)
+        # Small inputs finish faster in pure Python than it takes to load numba
+        if len(self._big_rank) * len(self._little_rank) >= _COMPILED_MIN_PAIRS:
+            compiled_mask = _load_compiled_mask()
+            if compiled_mask is not None:
+                return self._check_instabilities_compiled(matches, compiled_mask)
+        return self._check_instabilities_dict_prefs(matches)
     
-    def _check_instabilities_list_prefs(self, matches):
-        """Check for instabilities in list-based preference structure (standard SMP)"""
-        instabilities = []
+    def is_stable(self, matches):
+        """Return whether matches has no blocking pair, stopping at the first one found"""
         big_to_little = {b: l for b, l in matches}
         little_to_big = {l: b for b, l in matches}
         
-        for b in self.big_prefs:
-            for l in self.big_prefs[b]:
-                # Skip if this is their match
-                if big_to_little.get(b) == l:
-                    continue
-                    
-                b_matched_l = big_to_little.get(b)
-                l_matched_b = little_to_big.get(l)
-                
-                # Both must be matched to check for instability
-                if not b_matched_l or not l_matched_b:
-                    continue
-                
-                # Check preferences
-                b_prefers_l = self.big_prefs[b].index(l) < self.big_prefs[b].index(b_matched_l)
-                l_prefers_b = self.little_prefs[l].index(b) < self.little_prefs[l].index(l_matched_b)
-                
-                if b_prefers_l and l_prefers_b:
-                    instabilities.append((b, l))
+        for b, l in self._get_all_potential_pairs(big_to_little, little_to_big):
+            if self._is_instability(b, l, big_to_little, little_to_big):
+                return False
+        return True
+    
+    def _check_instabilities_compiled(self, matches, compiled_mask):
+        """Check for instabilities with the numba kernel over dense rank matrices (list or dict preferences)"""
+        big_idx = {b: i for i, b in enumerate(self._big_rank)}
+        little_idx = {l: j for j, l in enumerate(self._little_rank)}
+        big_to_little = {b: l for b, l in matches}
+        little_to_big = {l: b for b, l in matches}
         
-        return instabilities
+        # Unranked pairs get an infinite rank, so they can never block
+        big_rank = np.full((len(big_idx), len(little_idx)), np.inf)
+        little_rank = np.full((len(big_idx), len(little_idx)), np.inf)
+        for b, ranks in self._big_rank.items():
+            for l, rank in ranks.items():
+                if l in little_idx:
+                    big_rank[big_idx[b], little_idx[l]] = rank
+        for l, ranks in self._little_rank.items():
+            for b, rank in ranks.items():
+                if b in big_idx:
+                    little_rank[big_idx[b], little_idx[l]] = rank
+        
+        big_match_rank = np.array([
+            self._big_rank[b].get(big_to_little[b], np.inf) if b in big_to_little else np.nan
+            for b in big_idx
+        ], dtype=np.float64)
+        little_match_rank = np.array([
+            self._little_rank[l].get(little_to_big[l], np.inf) if l in little_to_big else np.nan
+            for l in little_idx
+        ], dtype=np.float64)
+        
+        mask = compiled_mask(big_rank, little_rank, big_match_rank, little_match_rank)
+        bigs = list(big_idx)
+        littles = list(little_idx)
+        return [(bigs[i], littles[j]) for i, j in zip(*np.nonzero(mask))]
+    
+    @staticmethod
+    def _ranks(prefs):
+        """Map each ranked participant to their rank, for list or dict preferences"""
+        if isinstance(prefs, list):
+            ranks = {}
+            for rank, p in enumerate(prefs):
+                # A repeated name keeps its first (best) rank, as list.index gives
+                ranks.setdefault(p, rank)
+            return ranks
+        return prefs
     
     def _check_instabilities_dict_prefs(self, matches):
-        """Check for instabilities in dictionary-based preference structure (SMT/SMTI)"""
+        """Check for instabilities over the canonical rank dicts (any preference structure)"""
         instabilities = []
         big_to_little = {b: l for b, l in matches}
         little_to_big = {l: b for b, l in matches}
@@ -385,30 +497,31 @@ class BigLittleMatcher:
         return instabilities
     
     def _get_all_potential_pairs(self, big_to_little, little_to_big):
-        """Generate potential blocking pairs to check"""
-        pairs = []
-        for b in self.big_prefs:
+        """Generate potential blocking pairs to check (only partners b ranked can block)"""
+        for b, prefs in self._big_rank.items():
             if b not in big_to_little:
                 continue
                 
-            for l in self.little_prefs:
+            for l in prefs:
                 if l not in little_to_big or l == big_to_little[b]:
                     continue
                     
-                pairs.append((b, l))
-        return pairs
+                yield (b, l)
     
     def _is_instability(self, b, l, big_to_little, little_to_big):
         """Check if (b,l) is a blocking pair based on their current matches"""
         b_matched_l = big_to_little.get(b)
         l_matched_b = little_to_big.get(l)
         
-        # Get ranks (infinity if not ranked)
-        b_matched_rank = self.big_prefs.get(b, {}).get(b_matched_l, float('inf'))
-        l_matched_rank = self.little_prefs.get(l, {}).get(l_matched_b, float('inf'))
+        b_ranks = self._big_rank.get(b, {})
+        l_ranks = self._little_rank.get(l, {})
+        
+        # Get ranks (_INF if not ranked)
+        b_matched_rank = b_ranks.get(b_matched_l, _INF)
+        l_matched_rank = l_ranks.get(l_matched_b, _INF)
         
-        b_rank_of_l = self.big_prefs.get(b, {}).get(l, float('inf'))
-        l_rank_of_b = self.little_prefs.get(l, {}).get(b, float('inf'))
+        b_rank_of_l = b_ranks.get(l, _INF)
+        l_rank_of_b = l_ranks.get(b, _INF)
         
         # They form a blocking pair if both prefer each other to current match
         return b_rank_of_l < b_matched_rank and l_rank_of_b < l_matched_rank
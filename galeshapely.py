@@ -23,7 +23,7 @@ class GaleShapley:
         next_proposals = {proposer: 0 for proposer in self.proposers}
         
         while free_proposers:
-            proposer = free_proposers.pop(0)
+            proposer = free_proposers.pop()
             
             if next_proposals[proposer] >= len(self.proposers_prefs[proposer]):
                 continue